@@ -1,7 +1,20 @@
+import asyncio
+import json
+import logging
 import os
+import queue
+import re
+import threading
 import time
+import httpx
 import streamlit as st
-from openai import OpenAI
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    InternalServerError,
+    RateLimitError,
+)
 
 # =============================
 # PAGE CONFIG
@@ -21,10 +34,82 @@ if not API_KEY:
     st.error("Missing GROQ_API_KEY. Add it in Streamlit Secrets (Cloud) or as an environment variable locally.")
     st.stop()
 
-client = OpenAI(
-    api_key=API_KEY,
-    base_url="https://api.groq.com/openai/v1",
-)
+BASE_URL = "https://api.groq.com/openai/v1"
+
+
+@st.cache_resource
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    # One long-lived loop so the cached client's connection pool survives across reruns.
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+WARMUP_MODEL = "llama-3.1-8b-instant"
+
+
+async def warm_up(client: AsyncOpenAI) -> None:
+    # 1-token request so DNS, TLS and the keep-alive pool are ready before the first Run.
+    try:
+        await client.chat.completions.create(
+            model=WARMUP_MODEL,
+            messages=[{"role": "user", "content": "hi"}],
+            max_tokens=1,
+        )
+    except Exception:
+        pass
+
+
+@st.cache_resource
+def get_client() -> AsyncOpenAI:
+    # The SDK retries 429s, 5xx and connection errors with jittered exponential backoff.
+    client = AsyncOpenAI(
+        api_key=API_KEY,
+        base_url=BASE_URL,
+        max_retries=4,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=16, keepalive_expiry=30.0),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        ),
+    )
+    asyncio.run_coroutine_threadsafe(warm_up(client), get_event_loop())
+    return client
+
+
+client = get_client()
+
+# =============================
+# ASYNC RUNTIME
+# =============================
+class StreamSlot:
+    """Stands in for an st.empty() inside coroutines running on the background loop.
+
+    Streamlit calls only work on the script thread, so each update is queued under
+    `key` and picked up by the UI on its next poll.
+    """
+
+    def __init__(self, key, updates: queue.Queue):
+        self.key = key
+        self.updates = updates
+
+    def markdown(self, text: str) -> None:
+        self.updates.put((self.key, text))
+
+
+def start_job(coro, updates: queue.Queue) -> dict:
+    """Schedule `coro` on the shared loop and return a job record for st.session_state."""
+    return {
+        "future": asyncio.run_coroutine_threadsafe(coro, get_event_loop()),
+        "updates": updates,
+        "texts": {},
+    }
+
+
+def drain_updates(job: dict) -> None:
+    updates = job["updates"]
+    while not updates.empty():
+        key, text = updates.get_nowait()
+        job["texts"][key] = text
 
 # =============================
 # MODEL OPTIONS
@@ -32,134 +117,570 @@ client = OpenAI(
 # =============================
 MODEL_OPTIONS = [
     "llama-3.1-8b-instant",
+    "llama-3.3-70b-versatile",
 ]
 
+# =============================
+# RESPONSE CACHE
+# =============================
+@st.cache_resource(ttl=3600, show_spinner=False)
+def get_response_cache() -> dict:
+    # Shared across sessions, so re-running a preset returns instantly.
+    return {}
+
+
+def cache_key(
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    max_tokens: int | None = None,
+) -> tuple:
+    # Case/whitespace-insensitive so trivially re-typed questions still hit.
+    def norm(text: str) -> str:
+        return " ".join(text.split()).casefold()
+
+    return (model, norm(system_prompt), norm(user_prompt), temperature, max_tokens)
+
+
+@st.cache_resource(show_spinner=False)
+def get_inflight_calls() -> dict:
+    # cache_key -> future of a call already on the wire; identical calls wait on it
+    # instead of issuing their own. It resolves to the text, or None if that call
+    # failed. Only touched from the event-loop thread.
+    return {}
+
 # =============================
 # LLM CALL
 # =============================
-def call_llm(model: str, system_prompt: str, user_prompt: str, temperature: float = 0.6) -> str:
-    resp = client.chat.completions.create(
+STREAM_FLUSH_S = 0.05
+STREAM_FLUSH_CHUNKS = 32
+
+
+async def call_llm(
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.6,
+    max_tokens: int | None = None,
+    placeholder=None,
+    on_delta=None,
+) -> str:
+    cache = get_response_cache()
+    key = cache_key(model, system_prompt, user_prompt, temperature, max_tokens)
+    if key in cache:
+        if placeholder is not None:
+            placeholder.markdown(cache[key])
+        return cache[key]
+
+    inflight = get_inflight_calls()
+    if key in inflight:
+        # shield: our own cancellation must not cancel the shared call for other waiters.
+        text = await asyncio.shield(inflight[key])
+        if text is None:
+            # The call we were waiting on failed or was cancelled; make our own.
+            return await call_llm(model, system_prompt, user_prompt, temperature, max_tokens, placeholder, on_delta)
+        if placeholder is not None:
+            placeholder.markdown(text)
+        return text
+
+    shared = asyncio.get_running_loop().create_future()
+    inflight[key] = shared
+    try:
+        text = await fetch_completion(model, system_prompt, user_prompt, temperature, max_tokens, placeholder, on_delta)
+        cache[key] = text
+        shared.set_result(text)
+    finally:
+        del inflight[key]
+        if not shared.done():
+            # None tells waiters there is no result to share.
+            shared.set_result(None)
+    return text
+
+
+async def fetch_completion(
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    max_tokens: int | None,
+    placeholder=None,
+    on_delta=None,
+) -> str:
+    # With a placeholder (st.empty()) or on_delta callback, stream tokens as they arrive.
+    stream = placeholder is not None or on_delta is not None
+    resp = await client.chat.completions.create(
         model=model,
         temperature=temperature,
+        max_tokens=max_tokens,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
         ],
+        stream=stream,
     )
-    return resp.choices[0].message.content.strip()
+    if not stream:
+        text = resp.choices[0].message.content.strip()
+    else:
+        buf = ""
+        pending = 0
+        last_flush = time.monotonic()
+        async for chunk in resp:
+            # Role-only and finish_reason chunks carry no text; skip them so chunk
+            # counts downstream track content tokens.
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            buf += delta
+            pending += 1
+            # Re-rendering on every token floods the websocket; flush in small bursts instead.
+            if placeholder is not None and (
+                pending >= STREAM_FLUSH_CHUNKS or time.monotonic() - last_flush > STREAM_FLUSH_S
+            ):
+                placeholder.markdown(buf)
+                pending = 0
+                last_flush = time.monotonic()
+            if on_delta is not None:
+                on_delta(buf)
+        if placeholder is not None:
+            placeholder.markdown(buf)
+        text = buf.strip()
+
+    return text
+
+
+def slot(placeholders, i: int):
+    return placeholders[i] if placeholders else None
+
+
+RETRY_EXHAUSTED = "⚠️ retry exhausted"
+# What the SDK retries (APITimeoutError is an APIConnectionError). Anything else -- auth,
+# bad requests, bugs -- wasn't retried and should fail the run visibly instead.
+TRANSIENT_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+UPSTREAM_FAILED = "⚠️ skipped — an earlier step failed"
+
+
+def is_failure(text: str) -> bool:
+    return text.startswith((RETRY_EXHAUSTED, UPSTREAM_FAILED))
+
+
+async def guarded(coro, placeholder=None, inputs=(), partial_ok: bool = False) -> str:
+    """Await one agent call, turning a failure into a marker so sibling agents keep going.
+
+    Only transient errors are caught; the SDK has already retried those by the time
+    they land here. If any of `inputs` is itself a marker (or, with `partial_ok`, all
+    of them are), the call is skipped instead of fed a failure.
+    """
+    failed = [is_failure(text) for text in inputs]
+    if failed and (all(failed) if partial_ok else any(failed)):
+        coro.close()
+        text = UPSTREAM_FAILED
+    else:
+        try:
+            return await coro
+        except TRANSIENT_ERRORS as e:
+            logging.warning("Agent call failed after retries", exc_info=e)
+            text = f"{RETRY_EXHAUSTED} ({type(e).__name__})"
+    if placeholder is not None:
+        placeholder.markdown(text)
+    return text
 
 # =============================
 # ARCHITECTURES
 # =============================
-def run_sequential(model: str, question: str):
-    s1 = call_llm(
-        model,
-        'FORMAT RULE: Start exactly with "🧩 FRAME —". Then give 4–6 crisp bullets.',
-        question,
-        temperature=0.4,
-    )
+SEQUENTIAL_STEPS = [
+    "Step 1 — Frame dilemma",
+    "Step 2 — Pros vs Cons",
+    "Final — Decision",
+]
 
-    s2 = call_llm(
-        model,
-        'FORMAT RULE: Start exactly with "➕ TRADEOFFS —". Then give "Pros:" and "Cons:" with 3–5 bullets each. Keep it tight.',
-        s1,
-        temperature=0.4,
-    )
+HIERARCHICAL_STEPS = [
+    "Expert — Domain",
+    "Expert — Risks & Constraints",
+    "Expert — Stakeholders & Impact",
+    "Manager — Final synthesis",
+]
 
-    s3 = call_llm(
-        model,
-        'FORMAT RULE: Start exactly with "✅ DECISION —". Then give a 3–5 line recommendation + 1 line "When this might NOT apply:".',
-        s2,
-        temperature=0.4,
-    )
+SWARM_STEPS = [
+    "Agent 1 — Enthusiast (YES)",
+    "Agent 2 — Purist (NO)",
+    "Agent 3 — Diplomat (BOTH)",
+    "Agent 4 — Pragmatist (DEPENDS)",
+    "Swarm — Aggregated view",
+]
 
-    return [
-        ("Step 1 — Frame dilemma", s1),
-        ("Step 2 — Pros vs Cons", s2),
-        ("Final — Decision", s3),
-    ]
 
+# Every call that only needs the question uses the same system prompt and puts the
+# question first, with the role cue last. Identical prefixes let the provider's
+# prefix cache skip re-running prefill for the shared part.
+PANEL_SYSTEM_PROMPT = "You are a panel member. Answer the question in the role given at the end and follow its FORMAT RULE exactly."
 
-def run_hierarchical(model: str, question: str):
-    expert1 = call_llm(
-        model,
-        'FORMAT RULE: Start exactly with "🧠 DOMAIN —". Then give 5–7 bullets: context + key criteria.',
-        question,
-        temperature=0.5,
-    )
 
-    expert2 = call_llm(
-        model,
-        'FORMAT RULE: Start exactly with "⚠️ RISKS —". Then give 5–7 bullets: risks, constraints, edge cases, failure modes.',
-        question,
-        temperature=0.5,
-    )
+def role_prompt(question: str, role: str, context: str = "") -> str:
+    return f"Question:\n{question}\n\n{context}ROLE: {role}"
 
-    expert3 = call_llm(
-        model,
-        'FORMAT RULE: Start exactly with "👥 STAKEHOLDERS —". Then give 5–7 bullets: who is affected + incentives + fairness/ethics + adoption.',
-        question,
-        temperature=0.5,
-    )
 
-    manager = call_llm(
-        model,
-        'FORMAT RULE: Start exactly with "👑 MANAGER —". Then produce: (1) Final recommendation in 4–6 lines, (2) 2 key takeaways, (3) 1 open question.',
-        f"Question:\n{question}\n\nDomain:\n{expert1}\n\nRisks:\n{expert2}\n\nStakeholders:\n{expert3}",
-        temperature=0.4,
-    )
+FRAME_PROMPT = 'FORMAT RULE: Start exactly with "🧩 FRAME —". Then give 4–6 crisp bullets.'
+TRADEOFFS_PROMPT = 'FORMAT RULE: Start exactly with "➕ TRADEOFFS —". Then give "Pros:" and "Cons:" with 3–5 bullets each. Keep it tight.'
+DECISION_PROMPT = 'FORMAT RULE: Start exactly with "✅ DECISION —". Then give a 3–5 line recommendation + 1 line "When this might NOT apply:".'
+
+EXPERT_PROMPTS = [
+    'FORMAT RULE: Start exactly with "🧠 DOMAIN —". Then give 5–7 bullets: context + key criteria.',
+    'FORMAT RULE: Start exactly with "⚠️ RISKS —". Then give 5–7 bullets: risks, constraints, edge cases, failure modes.',
+    'FORMAT RULE: Start exactly with "👥 STAKEHOLDERS —". Then give 5–7 bullets: who is affected + incentives + fairness/ethics + adoption.',
+]
+MANAGER_PROMPT = 'FORMAT RULE: Start exactly with "👑 MANAGER —". Then produce: (1) Final recommendation in 4–6 lines, (2) 2 key takeaways, (3) 1 open question.'
+
+PERSONA_PROMPTS = [
+    'FORMAT RULE: Start exactly with "✅ YES —". Then give 2–4 punchy lines. No bullet points.',
+    'FORMAT RULE: Start exactly with "❌ NO —". Then give 2–4 punchy lines. No bullet points.',
+    'FORMAT RULE: Start exactly with "➖ BOTH —". Then give 2–4 punchy lines. No bullet points.',
+    'FORMAT RULE: Start exactly with "⚖️ IT DEPENDS —". Then give 2–4 punchy lines focused on real-world choice/market.',
+]
+# "✅ YES —" etc., as mandated by each persona's FORMAT RULE.
+PERSONA_PREFIXES = [re.search(r'Start exactly with "(.+?)"', prompt).group(1) for prompt in PERSONA_PROMPTS]
+
+# Output caps per role, sized to what each FORMAT RULE asks for; decode time scales with output length.
+MAX_TOKENS = {
+    "frame": 220,
+    "pros_cons": 320,
+    "decision": 220,
+    "expert": 320,
+    "manager": 380,
+    "persona": 180,
+}
+
+
+# First-wave calls as (model, system_prompt, user_prompt, temperature, max_tokens), the
+# positional order of call_llm. The pipelines and batch mode both build them here, so
+# batch results always land under the cache keys the pipelines look up.
+def frame_call(model: str, question: str) -> tuple:
+    return (model, PANEL_SYSTEM_PROMPT, role_prompt(question, FRAME_PROMPT), 0.4, MAX_TOKENS["frame"])
+
 
+def expert_calls(model: str, question: str) -> list[tuple]:
     return [
-        ("Expert — Domain", expert1),
-        ("Expert — Risks & Constraints", expert2),
-        ("Expert — Stakeholders & Impact", expert3),
-        ("Manager — Final synthesis", manager),
+        (model, PANEL_SYSTEM_PROMPT, role_prompt(question, prompt), 0.5, MAX_TOKENS["expert"])
+        for prompt in EXPERT_PROMPTS
     ]
 
 
-def run_swarm(model: str, question: str):
-    a = call_llm(
-        model,
-        'FORMAT RULE: Start exactly with "✅ YES —". Then give 2–4 punchy lines. No bullet points.',
-        question,
-        temperature=0.7,
-    )
+def persona_calls(model: str, question: str) -> list[tuple]:
+    return [
+        (model, PANEL_SYSTEM_PROMPT, role_prompt(question, prompt), 0.7, MAX_TOKENS["persona"])
+        for prompt in PERSONA_PROMPTS
+    ]
 
-    b = call_llm(
-        model,
-        'FORMAT RULE: Start exactly with "❌ NO —". Then give 2–4 punchy lines. No bullet points.',
-        question,
-        temperature=0.7,
-    )
 
-    c = call_llm(
-        model,
-        'FORMAT RULE: Start exactly with "➖ BOTH —". Then give 2–4 punchy lines. No bullet points.',
-        question,
-        temperature=0.7,
+# Speculative sequential: once a step is within SPECULATION_MAX_TAIL content chunks
+# (~tokens) of its max_tokens budget, start the next step on what has streamed so far.
+# The head start is kept only if the finished step added at most that tail beyond
+# the partial, so the next step never works from a materially shorter input.
+SPECULATION_MAX_TAIL = 32
+
+
+async def speculate(make_call, follow_up, max_tokens: int):
+    """Await `make_call(on_delta)` while launching `follow_up` early on its partial output.
+
+    Returns (text, follow_up_result). The early follow-up is cancelled and re-run on
+    the final text if that text is a failure marker, or if it grew by more than
+    SPECULATION_MAX_TAIL chunks after the follow-up was launched.
+    """
+    trigger = max(1, max_tokens - SPECULATION_MAX_TAIL)
+    spec = None
+    spec_chunks = 0
+    chunks = 0
+
+    def on_delta(buf: str) -> None:
+        nonlocal spec, spec_chunks, chunks
+        chunks += 1
+        if spec is None and chunks >= trigger:
+            spec_chunks = chunks
+            spec = asyncio.create_task(follow_up(buf.strip()))
+
+    try:
+        text = await make_call(on_delta)
+    except BaseException:
+        if spec is not None:
+            spec.cancel()
+        raise
+
+    # A step that failed after streaming a partial must not keep a follow-up built on
+    # it; re-running follow_up on the marker marks the later steps as skipped.
+    if spec is not None and not is_failure(text) and chunks - spec_chunks <= SPECULATION_MAX_TAIL:
+        return text, await spec
+    if spec is not None:
+        spec.cancel()
+    return text, await follow_up(text)
+
+
+async def run_sequential(
+    model: str,
+    scratch_model: str,
+    question: str,
+    placeholders=None,
+    speculative: bool = False,
+):
+    def frame(on_delta=None):
+        call = call_llm(
+            *frame_call(scratch_model, question),
+            placeholder=slot(placeholders, 0),
+            on_delta=on_delta,
+        )
+        return guarded(call, slot(placeholders, 0))
+
+    def tradeoffs(s1, on_delta=None):
+        call = call_llm(
+            scratch_model,
+            TRADEOFFS_PROMPT,
+            s1,
+            temperature=0.4,
+            max_tokens=MAX_TOKENS["pros_cons"],
+            placeholder=slot(placeholders, 1),
+            on_delta=on_delta,
+        )
+        return guarded(call, slot(placeholders, 1), inputs=(s1,))
+
+    def decision(s2):
+        call = call_llm(
+            model,
+            DECISION_PROMPT,
+            s2,
+            temperature=0.4,
+            max_tokens=MAX_TOKENS["decision"],
+            placeholder=slot(placeholders, 2),
+        )
+        return guarded(call, slot(placeholders, 2), inputs=(s2,))
+
+    if speculative:
+        async def tradeoffs_then_decision(s1):
+            return await speculate(lambda on_delta: tradeoffs(s1, on_delta), decision, MAX_TOKENS["pros_cons"])
+
+        s1, (s2, s3) = await speculate(frame, tradeoffs_then_decision, MAX_TOKENS["frame"])
+    else:
+        s1 = await frame()
+        s2 = await tradeoffs(s1)
+        s3 = await decision(s2)
+
+    return list(zip(SEQUENTIAL_STEPS, [s1, s2, s3]))
+
+
+async def run_hierarchical(model: str, scratch_model: str, question: str, placeholders=None):
+    # Experts only see the question, so they can run concurrently.
+    expert1, expert2, expert3 = await asyncio.gather(*(
+        guarded(call_llm(*call, placeholder=slot(placeholders, i)), slot(placeholders, i))
+        for i, call in enumerate(expert_calls(scratch_model, question))
+    ))
+
+    # A failed expert leaves a marker in the context and the manager works with the
+    # rest; only when every expert failed is there nothing to synthesise.
+    manager = await guarded(
+        call_llm(
+            model,
+            PANEL_SYSTEM_PROMPT,
+            role_prompt(
+                question,
+                MANAGER_PROMPT,
+                f"Domain:\n{expert1}\n\nRisks:\n{expert2}\n\nStakeholders:\n{expert3}\n\n",
+            ),
+            temperature=0.4,
+            max_tokens=MAX_TOKENS["manager"],
+            placeholder=slot(placeholders, 3),
+        ),
+        slot(placeholders, 3),
+        inputs=(expert1, expert2, expert3),
+        partial_ok=True,
     )
 
-    d = call_llm(
-        model,
-        'FORMAT RULE: Start exactly with "⚖️ IT DEPENDS —". Then give 2–4 punchy lines focused on real-world choice/market.',
-        question,
-        temperature=0.7,
+    return list(zip(HIERARCHICAL_STEPS, [expert1, expert2, expert3, manager]))
+
+
+def aggregate_swarm(outputs: list[str]) -> str:
+    """Summarise the personas locally instead of spending another LLM round-trip.
+
+    Each stance is reduced to the first line after its FORMAT RULE prefix. The
+    dominant pattern is the stance whose wording the other agents echo most (word
+    overlap), and the outlier is the one they echo least. Either is only named when
+    it is unique; failed personas are listed but not scored, and no consensus is forced.
+    """
+    def first_line(text: str, prefix: str) -> str:
+        # Strip the prefix first: personas sometimes put it on a line of its own.
+        body = text.strip().removeprefix(prefix)
+        return next((ln.strip() for ln in body.splitlines() if ln.strip()), "(no answer)")
+
+    def words(text: str) -> set[str]:
+        return {w for w in re.findall(r"[a-z']+", text.lower()) if len(w) > 3}
+
+    labels = [prefix.rstrip(" —") for prefix in PERSONA_PREFIXES]
+    answered = [i for i, text in enumerate(outputs) if not is_failure(text)]
+    if not answered:
+        return "All agents failed — nothing to aggregate."
+
+    bullets = "\n".join(
+        f"- **{label}**: {first_line(text, prefix) if i in answered else '_no answer (agent failed)_'}"
+        for i, (label, prefix, text) in enumerate(zip(labels, PERSONA_PREFIXES, outputs))
     )
 
-    agg = call_llm(
-        model,
-        "You are the Swarm Aggregator. Summarize each stance in 1 line. Then output a dominant pattern in 2–3 lines. Do NOT force consensus.",
-        f"Question:\n{question}\n\nAgent 1:\n{a}\n\nAgent 2:\n{b}\n\nAgent 3:\n{c}\n\nAgent 4:\n{d}",
-        temperature=0.4,
+    bags = {i: words(outputs[i]) for i in answered}
+
+    def echo(i: int) -> float:
+        return sum(
+            len(bags[i] & other) / (len(bags[i] | other) or 1)
+            for j, other in bags.items()
+            if j != i
+        )
+
+    scores = {i: echo(i) for i in answered}
+    top, bottom = max(scores.values()), min(scores.values())
+    leaders = [i for i, score in scores.items() if score == top]
+    laggards = [i for i, score in scores.items() if score == bottom]
+
+    if top > 0 and len(leaders) == 1:
+        pattern = f"{labels[leaders[0]]} shares the most ground with the other agents"
+    else:
+        pattern = "no dominant pattern — no single stance is echoed more than the rest"
+    if top > bottom and len(laggards) == 1:
+        pattern += f"; {labels[laggards[0]]} stands furthest apart"
+    return f"{bullets}\n\n**Dominant pattern:** {pattern}."
+
+
+async def run_swarm(scratch_model: str, question: str, placeholders=None):
+    # Personas are independent of each other; only the aggregation waits on them.
+    a, b, c, d = await asyncio.gather(*(
+        guarded(call_llm(*call, placeholder=slot(placeholders, i)), slot(placeholders, i))
+        for i, call in enumerate(persona_calls(scratch_model, question))
+    ))
+
+    agg = aggregate_swarm([a, b, c, d])
+    if slot(placeholders, 4) is not None:
+        slot(placeholders, 4).markdown(agg)
+
+    return list(zip(SWARM_STEPS, [a, b, c, d, agg]))
+
+
+def independent_calls(model: str, question: str) -> list[tuple]:
+    """(model, system_prompt, user_prompt, temperature, max_tokens) for every call that only needs the question."""
+    return [frame_call(model, question)] + expert_calls(model, question) + persona_calls(model, question)
+
+
+async def run_all(
+    model: str,
+    scratch_model: str,
+    question: str,
+    placeholders=(None, None, None),
+    speculative: bool = False,
+):
+    # The pipelines share nothing but the inputs, so total latency is the slowest one.
+    return await asyncio.gather(
+        run_sequential(model, scratch_model, question, placeholders[0], speculative),
+        run_hierarchical(model, scratch_model, question, placeholders[1]),
+        run_swarm(scratch_model, question, placeholders[2]),
     )
 
-    return [
-        ("Agent 1 — Enthusiast (YES)", a),
-        ("Agent 2 — Purist (NO)", b),
-        ("Agent 3 — Diplomat (BOTH)", c),
-        ("Agent 4 — Pragmatist (DEPENDS)", d),
-        ("Swarm — Aggregated view", agg),
+
+async def run_demo(
+    model: str,
+    scratch_model: str,
+    question: str,
+    placeholders,
+    speculative: bool = False,
+    batch: bool = False,
+):
+    """Full demo run: optional batch prefetch, then all three patterns.
+
+    Returns (results, batch_ok, elapsed seconds).
+    """
+    t0 = time.time()
+    batch_ok = True
+    if batch:
+        try:
+            batch_ok = await prefetch_batch(independent_calls(scratch_model, question))
+        except Exception:
+            # Whatever the batch didn't cover is simply fetched live below.
+            batch_ok = False
+    try:
+        results = await run_all(model, scratch_model, question, placeholders, speculative)
+    except Exception:
+        # The future only surfaces this in the UI; put the traceback in the app logs too.
+        logging.exception("Run failed")
+        raise
+    return results, batch_ok, time.time() - t0
+
+
+# =============================
+# BATCH MODE
+# =============================
+BATCH_TIMEOUT_S = 600
+
+
+async def prefetch_batch(calls: list[tuple]) -> bool:
+    """Run `calls` through the Batch API and seed the response cache with the results.
+
+    Returns False if the batch did not complete in time; callers then just run the
+    pipelines normally and any missing results are fetched live.
+    """
+    calls = list(dict.fromkeys(calls))
+    lines = [
+        json.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+            },
+        })
+        for i, (model, system_prompt, user_prompt, temperature, max_tokens) in enumerate(calls)
     ]
+    batch_file = await client.files.create(
+        file=("batch.jsonl", "\n".join(lines).encode()),
+        purpose="batch",
+    )
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+
+    deadline = time.monotonic() + BATCH_TIMEOUT_S
+    delay = 2.0
+    try:
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if time.monotonic() > deadline:
+                await client.batches.cancel(batch.id)
+                return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+            batch = await client.batches.retrieve(batch.id)
+    except asyncio.CancelledError:
+        # The job was cancelled (e.g. Run clicked again); don't leave the batch running and billed.
+        try:
+            await client.batches.cancel(batch.id)
+        except Exception:
+            logging.warning("Could not cancel batch %s", batch.id, exc_info=True)
+        raise
+
+    if batch.status != "completed" or not batch.output_file_id:
+        return False
+
+    output = await client.files.content(batch.output_file_id)
+    cache = get_response_cache()
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        response = result.get("response") or {}
+        if response.get("status_code") != 200:
+            continue
+        model, system_prompt, user_prompt, temperature, max_tokens = calls[int(result["custom_id"])]
+        text = response["body"]["choices"][0]["message"]["content"].strip()
+        cache[cache_key(model, system_prompt, user_prompt, temperature, max_tokens)] = text
+    return True
 
 
 # =============================
@@ -168,7 +689,16 @@ def run_swarm(model: str, question: str):
 st.title("R&C Agentic AI Orchestration: Live Demo")
 st.caption("Same input → different coordination pattern → different outputs (Sequential • Hierarchical • Swarm)")
 
-model = st.selectbox("Model", MODEL_OPTIONS, index=0)
+m1, m2 = st.columns(2)
+with m1:
+    model = st.selectbox("Model", MODEL_OPTIONS, index=0, help="Used for the final step of Sequential and Hierarchical; Swarm aggregates locally.")
+with m2:
+    scratch_model = st.selectbox(
+        "Scratch model",
+        MODEL_OPTIONS,
+        index=MODEL_OPTIONS.index("llama-3.1-8b-instant"),
+        help="Used for the intermediate experts, personas and sequential steps.",
+    )
 
 preset_questions = {
     "🍍 Pineapple on pizza? (classic)": "Should pineapple go on pizza?",
@@ -189,46 +719,104 @@ else:
     question = preset_questions[preset]
     st.info(f"Using preset: {question}")
 
+# The question goes into every prompt, so don't pay prefill for stray whitespace.
+question = " ".join(question.split())
+
 show_steps = st.toggle("Show intermediate steps", value=True)
+batch_mode = st.toggle(
+    "Batch mode (cheaper, ~minutes)",
+    value=False,
+    help="Submit the independent first-wave calls through the Batch API; synthesis steps run normally afterwards.",
+)
+fast_sequential = st.toggle(
+    "Fast sequential (speculative)",
+    value=False,
+    help="Start each sequential step while the previous one is streaming its last few lines; may spend extra tokens when it has to restart.",
+)
 
 run = st.button("Run demo", type="primary")
 
-if run:
-    col1, col2, col3 = st.columns(3)
+PATTERNS = [
+    ("Sequential 🧩", SEQUENTIAL_STEPS),
+    ("Hierarchical 👑", HIERARCHICAL_STEPS),
+    ("Swarm 🐝", SWARM_STEPS),
+]
+
+# Only the Run click needs a question; a blank box mustn't hide the controls or results.
+if run and not question:
+    st.warning("Enter a question.")
+elif run:
+    if "job" in st.session_state:
+        st.session_state["job"]["future"].cancel()
+
+    # Every step gets a slot, so toggling "Show intermediate steps" mid-run still has text to show.
+    updates = queue.Queue()
+    placeholders = tuple(
+        [StreamSlot((p, i), updates) for i in range(len(labels))]
+        for p, (_, labels) in enumerate(PATTERNS)
+    )
+    st.session_state["job"] = start_job(
+        run_demo(model, scratch_model, question, placeholders, fast_sequential, batch_mode),
+        updates,
+    )
+
+
+def render(col, title, labels, texts):
+    # One markdown element per column: the fragment redraws this on every poll.
+    parts = [f"### {title}\n"]
+    if show_steps:
+        for i, k in enumerate(labels[:-1]):
+            parts.append(f"**{k}**\n\n{texts.get(i, '…')}\n\n---\n")
+    parts.append(f"**Final output**\n\n{texts.get(len(labels) - 1, '…')}")
+    with col:
+        st.markdown("\n".join(parts))
 
-    try:
-        with st.spinner("Running agents..."):
-            t0 = time.time()
-            seq = run_sequential(model, question)
-            hier = run_hierarchical(model, question)
-            swm = run_swarm(model, question)
-            t1 = time.time()
-
-        st.success(f"Completed in {t1 - t0:.1f}s")
-
-        def render(col, title, items):
-            with col:
-                st.subheader(title)
-                if show_steps:
-                    for k, v in items[:-1]:
-                        st.markdown(f"**{k}**")
-                        st.write(v)
-                        st.divider()
-                st.markdown("**Final output**")
-                st.write(items[-1][1])
-
-        render(col1, "Sequential 🧩", seq)
-        render(col2, "Hierarchical 👑", hier)
-        render(col3, "Swarm 🐝", swm)
-
-        st.divider()
-        st.markdown("### What to say (10 seconds)")
-        st.write(
-            "Sequential = step-by-step refinement • Hierarchical = experts in parallel + manager synthesis • "
-            "Swarm = independent viewpoints + aggregated pattern (no forced consensus)."
-        )
 
-    except Exception as e:
-        st.error(f"Run failed: {e}")
+POLL_S = 0.1
+
+
+# The run lives on the background loop; while it is going this runs as a fragment
+# every POLL_S, so the rest of the page (and its widgets) stays responsive.
+def show_job(polling: bool):
+    job = st.session_state["job"]
+    future = job["future"]
+    if polling and future.done():
+        # Finished (or cancelled) since the last full run: rerun the app once so the
+        # polling stops and a cancelled job gets dropped.
+        st.rerun()
+    drain_updates(job)
+
+    if future.done() and future.exception() is not None:
+        st.error(f"Run failed: {future.exception()}")
         st.info("If this persists, open Streamlit → Manage app → Logs and share the last error block.")
+        return
+
+    if future.done():
+        results, batch_ok, elapsed = future.result()
+        if not batch_ok:
+            st.warning("Batch did not complete — ran the remaining calls live.")
+        st.success(f"Completed in {elapsed:.1f}s")
+        texts = [{i: v for i, (_, v) in enumerate(items)} for items in results]
+    else:
+        st.caption("Running agents...")
+        texts = [{i: v for (p, i), v in job["texts"].items() if p == n} for n in range(len(PATTERNS))]
+
+    for col, (title, labels), pattern_texts in zip(st.columns(3), PATTERNS, texts):
+        render(col, title, labels, pattern_texts)
+
+    st.divider()
+    st.markdown("### What to say (10 seconds)")
+    st.write(
+        "Sequential = step-by-step refinement • Hierarchical = experts in parallel + manager synthesis • "
+        "Swarm = independent viewpoints + aggregated pattern (no forced consensus)."
+    )
+
+
+# A cancelled job has no result and will never finish; drop it rather than showing
+# "Running agents..." forever.
+if "job" in st.session_state and st.session_state["job"]["future"].cancelled():
+    del st.session_state["job"]
 
+if "job" in st.session_state:
+    running = not st.session_state["job"]["future"].done()
+    st.fragment(show_job, run_every=POLL_S if running else None)(running)